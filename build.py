@@ -4,13 +4,15 @@ import datetime
 import itertools as itt
 import json
 import logging
-import os
+import subprocess
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Iterator, TextIO
 
 import click
-import requests
+import ijson
+import requests_cache
 from funowl import (
     Annotation,
     AnnotationAssertion,
@@ -21,21 +23,58 @@ from funowl import (
     OntologyDocument,
 )
 from rdflib import DCTERMS, OWL, RDFS, Literal, Namespace, URIRef
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
 logger = logging.getLogger(__name__)
 
 HERE = Path(__file__).parent.resolve()
 OFN_PATH = HERE.joinpath("orcidio.ofn")
+OWL_PATH = HERE.joinpath("orcidio.owl")
 ORCIDS_PATH = HERE.joinpath("extra_orcids.txt")
+HTTP_CACHE_PATH = HERE.joinpath(".http_cache")
 ORCID = Namespace("https://orcid.org/")
 URI = "https://w3id.org/orcidio/orcidio.owl"
 OBO = Namespace("http://purl.obolibrary.org/obo/")
-WIKIDATA = Namespace("http://www.wikidata.org/entity/")
+WIKIDATA_URI_PREFIX = "http://www.wikidata.org/entity/"
+WIKIDATA = Namespace(WIKIDATA_URI_PREFIX)
 
 PARENT = "http://purl.obolibrary.org/obo/NCBITaxon_9606"
 
 RENAMES = json.loads(HERE.joinpath("renames.json").read_text())
 
+#: A session that keeps SPARQL responses on disk and revalidates them
+#: (e.g., with ``If-None-Match``) so unchanged queries aren't downloaded again
+SESSION = requests_cache.CachedSession(
+    HTTP_CACHE_PATH,
+    backend="sqlite",
+    cache_control=True,
+    expire_after=86400,
+    allowable_methods=("GET", "HEAD", "POST"),
+)
+SESSION.headers.update(
+    {
+        "User-Agent": "wikidata-orcid-ontology/1.0",
+        "Accept-Encoding": "gzip",
+    }
+)
+# keep connections alive between requests (e.g., to the SPARQL endpoint and
+# to ontology PURLs) and back off when a server is throttling or unavailable
+ADAPTER = HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=1.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        respect_retry_after_header=True,
+        # SPARQL queries are sent with POST but are safe to repeat
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {"POST"},
+    ),
+)
+SESSION.mount("http://", ADAPTER)
+SESSION.mount("https://", ADAPTER)
+
 #: A SPARQL query that gets ORCIDs for all people who have been annotated to have contributed to an OBO ontology
 OBO_SPARQL = """\
     SELECT DISTINCT ?orcid ?contributor ?contributorLabel ?contributorDescription
@@ -66,41 +105,134 @@ def format_custom_sparql(orcids: Iterable[str]) -> str:
 WikidataRecord = dict[str, any]
 
 
+def get_orcid_records(
+    orcids: Iterable[str], *, chunk_size: int = 200, max_workers: int = 4, refresh: bool = False
+) -> list[WikidataRecord]:
+    """Get records for the given ORCIDs, querying small chunks of them in parallel."""
+    orcids = sorted(orcids)
+    sparqls = [
+        format_custom_sparql(orcids[start : start + chunk_size])
+        for start in range(0, len(orcids), chunk_size)
+    ]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        chunks = executor.map(
+            lambda sparql: list(get_wikidata_records(sparql, refresh=refresh)), sparqls
+        )
+        return list(itt.chain.from_iterable(chunks))
+
+
 def get_records() -> Iterable[WikidataRecord]:
     """Get records from the OBO-centric ORCIDs and custom ORCID list."""
     custom_orcids = {line.strip() for line in ORCIDS_PATH.read_text().splitlines()}
-    custom_sparql = format_custom_sparql(custom_orcids)
 
-    return itt.chain(get_wikidata_records(OBO_SPARQL), get_wikidata_records(custom_sparql))
+    # the custom ORCIDs often overlap with OBO contributors, so only keep one
+    # record per ORCID, preferring ones that have a description
+    rv: dict[str, WikidataRecord] = {}
+    for record in itt.chain(get_wikidata_records(OBO_SPARQL), get_orcid_records(custom_orcids)):
+        existing = rv.setdefault(record["orcid"], record)
+        if not existing.get("contributorDescription") and record.get("contributorDescription"):
+            rv[record["orcid"]] = record
+    return list(rv.values())
 
 
-def get_wikidata_records(sparql: str) -> list[WikidataRecord]:
-    """Query the Wikidata SPARQL endpoint and unpack the records."""
+def get_wikidata_records(sparql: str, *, refresh: bool = False) -> Iterator[WikidataRecord]:
+    """Query the Wikidata SPARQL endpoint and lazily unpack the records."""
     start_time = time.time()
     logger.info("running sparql:\n%s", sparql)
-    res = requests.get(
+    # POST avoids the URL length limit on long queries, e.g., with many VALUES
+    res = SESSION.post(
         "https://query.wikidata.org/sparql",
-        params={"query": sparql, "format": "json"},
-        headers={
-            "User-Agent": "wikidata-orcid-ontology/1.0",
-            "Accept": "application/sparql-results+json",
-        },
+        data={"query": sparql, "format": "json"},
+        headers={"Accept": "application/sparql-results+json"},
+        # always go to the server for queries whose results must be current
+        force_refresh=refresh,
     )
     res.raise_for_status()
-    rv = [
-        {key: value["value"] for key, value in record.items()}
-        for record in res.json()["results"]["bindings"]
-    ]
+    # parse bindings one at a time rather than materializing the whole document
+    count = 0
+    for count, record in enumerate(ijson.items(res.content, "results.bindings.item"), start=1):
+        yield {key: value["value"] for key, value in record.items()}
     elapsed = time.time() - start_time
-    logger.info(f"retrieved {len(rv):,} records in {elapsed:.2f} seconds")
-    return rv
+    cached = " from cache" if res.from_cache else ""
+    logger.info(f"retrieved {count:,} records{cached} in {elapsed:.2f} seconds")
 
 
-@click.command()
-def main():
-    """Query the Wikidata SPARQL endpoint and return JSON."""
-    today = datetime.date.today().strftime("%Y-%m-%d")
+#: The header of the ontology document, including the ontology annotations
+OFN_HEADER_FMT = """\
+Prefix( xml: = <http://www.w3.org/XML/1998/namespace> )
+Prefix( rdf: = <http://www.w3.org/1999/02/22-rdf-syntax-ns#> )
+Prefix( rdfs: = <http://www.w3.org/2000/01/rdf-schema#> )
+Prefix( xsd: = <http://www.w3.org/2001/XMLSchema#> )
+Prefix( owl: = <http://www.w3.org/2002/07/owl#> )
+Prefix( orcid: = <https://orcid.org/> )
+Prefix( wikidata: = <http://www.wikidata.org/entity/> )
+Prefix( obo: = <http://purl.obolibrary.org/obo/> )
+Prefix( dcterms: = <http://purl.org/dc/terms/> )
+
+Ontology( <{uri}>
+    Annotation( dcterms:title "ORCID in OWL" )
+    Annotation( dcterms:creator orcid:0000-0003-4423-4370 )
+    Annotation( dcterms:license <https://creativecommons.org/publicdomain/zero/1.0/> )
+    Annotation( rdfs:seeAlso <https://github.com/cthoyt/orcidio> )
+    Annotation( owl:versionInfo "{today}" )
+    AnnotationAssertion( rdfs:label obo:NCBITaxon_9606 "Homo sapiens" )
+"""
+
+#: The axioms for a single contributor. The description is optional and formatted separately.
+OFN_RECORD_FMT = """\
+    AnnotationAssertion(
+        Annotation( dcterms:source {wikidata} )
+        rdfs:label orcid:{orcid} {name}
+    )
+    ClassAssertion( obo:NCBITaxon_9606 orcid:{orcid} )
+"""
+
+OFN_DESCRIPTION_FMT = """\
+    AnnotationAssertion(
+        Annotation( dcterms:source {wikidata} )
+        dcterms:description orcid:{orcid} {description}
+    )
+"""
 
+
+def _quote(value: str) -> str:
+    """Format a string as a quoted literal in OWL functional syntax."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _curie_or_uri(uri: str) -> str:
+    """Abbreviate a Wikidata URI to a CURIE, or otherwise wrap it in angle brackets."""
+    if uri.startswith(WIKIDATA_URI_PREFIX):
+        return "wikidata:" + uri[len(WIKIDATA_URI_PREFIX) :]
+    return f"<{uri}>"
+
+
+def write_ofn(records: Iterable[WikidataRecord], file: TextIO, *, today: str) -> None:
+    """Write the ontology document in OWL functional syntax directly from the records."""
+    file.write(OFN_HEADER_FMT.format(uri=URI, today=today))
+    orcids = []
+    for record in records:
+        orcid = record["orcid"]
+        name = RENAMES.get(orcid) or record["contributorLabel"]
+        description = record.get("contributorDescription")
+        wikidata = _curie_or_uri(record["contributor"])
+
+        file.write(OFN_RECORD_FMT.format(wikidata=wikidata, orcid=orcid, name=_quote(name)))
+        if description:
+            file.write(
+                OFN_DESCRIPTION_FMT.format(
+                    wikidata=wikidata, orcid=orcid, description=_quote(description)
+                )
+            )
+        orcids.append(orcid)
+    file.write("    Declaration( Class( obo:NCBITaxon_9606 ) )\n")
+    for orcid in orcids:
+        file.write(f"    Declaration( NamedIndividual( orcid:{orcid} ) )\n")
+    file.write(")\n")
+
+
+def get_ontology_document(records: Iterable[WikidataRecord], *, today: str) -> OntologyDocument:
+    """Build the ontology document with :mod:`funowl`, which validates each axiom."""
     ontology_iri = URIRef(URI)
     charlie_iri = ORCID["0000-0003-4423-4370"]
     ontology = Ontology(iri=ontology_iri)
@@ -118,7 +250,7 @@ def main():
     ontology.declarations(Class(human))
     ontology.annotations.append(AnnotationAssertion(RDFS.label, human, "Homo sapiens"))
 
-    for record in get_records():
+    for record in records:
         orcid_luid = record["orcid"]
         orcid = ORCID[orcid_luid]
         name = RENAMES.get(orcid_luid) or record["contributorLabel"]
@@ -147,7 +279,7 @@ def main():
                 )
             )
 
-    doc = OntologyDocument(
+    return OntologyDocument(
         ontology=ontology,
         orcid=ORCID,
         wikidata=WIKIDATA,
@@ -155,12 +287,24 @@ def main():
         dcterms=DCTERMS,
         owl=OWL,
     )
+
+
+@click.command()
+@click.option("--safe", is_flag=True, help="Build the ontology with funowl to validate it")
+def main(safe: bool):
+    """Query the Wikidata SPARQL endpoint and return JSON."""
+    today = datetime.date.today().strftime("%Y-%m-%d")
+    records = get_records()
     click.echo(f"writing to {OFN_PATH}")
-    OFN_PATH.write_text(f"{doc}\n")
+    with OFN_PATH.open("w", buffering=1 << 20) as file:
+        if safe:
+            file.write(f"{get_ontology_document(records, today=today)}\n")
+        else:
+            write_ofn(records, file, today=today)
 
-    cmd = "robot convert --input orcidio.ofn --output orcidio.owl"
-    click.secho(cmd, fg="green")
-    os.system(cmd)
+    args = ["robot", "convert", "--input", str(OFN_PATH), "--output", str(OWL_PATH)]
+    click.secho(" ".join(args), fg="green")
+    subprocess.run(args, check=True)
 
 
 if __name__ == "__main__":
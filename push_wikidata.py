@@ -13,8 +13,15 @@ MISSING_ORCID_PATH = HERE.joinpath("wikidata_missing_orcids.tsv")
 
 
 def main():
-    df = pd.read_csv(MISSING_ORCID_PATH, sep="\t", header=None, names=["orcid", "places"])
-    orcids = sorted({orcid for orcid in df["orcid"] if ORCID_RE.fullmatch(orcid)})
+    df = pd.read_csv(
+        MISSING_ORCID_PATH,
+        sep="\t",
+        header=None,
+        names=["orcid", "places"],
+        dtype={"orcid": "string"},
+    )
+    mask = df["orcid"].str.fullmatch(ORCID_RE, na=False)
+    orcids = sorted(df.loc[mask, "orcid"].unique().tolist())
     with logging_redirect_tqdm():
         lines = [line for orcid in tqdm(orcids) for line in iter_orcid_lines(orcid)]
     lines_to_new_tab(lines)
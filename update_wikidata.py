@@ -1,8 +1,19 @@
 """Update Wikidata."""
 
-import json
+import functools
+import gzip
+import itertools
+import multiprocessing
+import os
+import re
 import webbrowser
 from collections import Counter, defaultdict
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
 from pathlib import Path
 from textwrap import shorten
 from typing import Any, Iterable
@@ -10,7 +21,9 @@ from typing import Any, Iterable
 import bioontologies
 import bioregistry
 import click
-import pandas as pd
+import ijson
+import orjson
+import requests
 from quickstatements_client import (
     DateQualifier,
     EntityLine,
@@ -20,11 +33,20 @@ from quickstatements_client import (
 from tabulate import tabulate
 from tqdm import tqdm
 
-from build import format_custom_sparql, get_wikidata_records
+from build import SESSION, WikidataRecord, get_orcid_records, get_wikidata_records
 
 HERE = Path(__file__).parent.resolve()
 PREFIXES_PATH = HERE.joinpath("prefixes.json")
 MISSING_WD_ORCIDS_PATH = HERE.joinpath("wikidata_missing_orcids.tsv")
+OBOGRAPH_CACHE_DIRECTORY = HERE.joinpath(".obograph_cache")
+#: Unannotated ORCIDs for each ontology scanned so far, so an interrupted run can resume
+PROGRESS_PATH = HERE.joinpath("progress.jsonl")
+#: OBO Graph documents bigger than this when decompressed (in bytes) are streamed with ijson
+#: to bound memory. Smaller ones are decoded all at once with orjson, which is about twice as
+#: fast (measured on a 41 MB document)
+STREAMING_THRESHOLD = 32 * 1024 * 1024
+#: The number of nodes that are serialized and scanned for ORCIDs at a time
+SCAN_BATCH_SIZE = 10_000
 SKIP = {
     "ncbitaxon",
     "gaz",
@@ -35,46 +57,118 @@ SKIP = {
 }
 WD_URI_PREFIX = "http://www.wikidata.org/entity/"
 
+#: The number of resources that are processed concurrently
+MAX_WORKERS = 8
+#: Failures that only affect a single ontology, e.g., an unreachable PURL or a malformed
+#: OBO Graph document. Anything else is a bug, so it isn't caught. Transient HTTP errors
+#: are already retried with backoff by the adapter mounted on the shared session.
+ONTOLOGY_ERRORS = (
+    requests.RequestException,
+    KeyError,
+    ValueError,
+    OSError,
+    EOFError,
+    ijson.JSONError,
+)
+
 
 def secho(*args, **kwargs) -> None:
     tqdm.write(click.style(*args, **kwargs))
 
 
+@functools.cache
+def get_preferred_prefix(prefix: str) -> str:
+    return bioregistry.get_preferred_prefix(prefix) or prefix
+
+
 @click.command()
 @click.option("--dry", is_flag=True)
-def main(dry: bool):
-    lines: list[EntityLine] = []
+@click.option(
+    "--workers",
+    type=int,
+    default=MAX_WORKERS,
+    show_default=True,
+    help="The number of ontologies to download and scan concurrently",
+)
+@click.option("--fresh", is_flag=True, help="Ignore results saved by a previous, unfinished run")
+def main(dry: bool, workers: int, fresh: bool):
+    prefix_to_contributors: dict[str, list[str]] = {}
     wd_missing_orcids = defaultdict(list)
-    resources = [
-        resource
-        for resource in bioregistry.resources()
-        if (
-            resource.prefix not in SKIP
-            and resource.get_obofoundry_prefix()
-            and not resource.is_deprecated()
-        )
-    ]
-    it = tqdm(resources)
-    for resource in it:
-        it.set_postfix(prefix=resource.prefix)
-        try:
-            local_missing, local_lines = get_lines(resource.prefix)
-        except Exception as e:
-            secho(f"{resource.prefix.upper()} failed with {type(e)}: {e}")
+    prefix_to_qid = get_prefix_to_qid()
+    resources = get_resources(prefix_to_qid)
+
+    secho("getting existing ORCiD annotations")
+    qids = {prefix_to_qid[resource.prefix] for resource in resources}
+    annotations = get_all_existing_orcid_annotations(sorted(qids))
+
+    if fresh:
+        PROGRESS_PATH.unlink(missing_ok=True)
+    # the saved results predate the annotations that were just retrieved, and the resources
+    # may have changed since they were saved, so they're filtered the same way as new results
+    prefixes = {resource.prefix for resource in resources}
+    progress: dict[str, Counter[str]] = {}
+    for prefix, orcid_counter in load_progress().items():
+        if prefix not in prefixes:
             continue
-        else:
-            for orcid in local_missing:
-                wd_missing_orcids[orcid].append(resource.prefix)
-            lines.extend(local_lines)
-
-        # do this on every iteration for fast results
-        MISSING_WD_ORCIDS_PATH.write_text(
-            "".join(
-                orcid + "\t" + "|".join(sorted(resources)) + "\n"
-                for orcid, resources in sorted(wd_missing_orcids.items())
-            )
+        orcids_annotated = annotations.get(prefix_to_qid[prefix], set())
+        progress[prefix] = Counter(
+            {
+                orcid: count
+                for orcid, count in orcid_counter.items()
+                if orcid not in orcids_annotated
+            }
         )
-
+    if progress:
+        secho(f"resuming with {len(progress)} ontologies from {PROGRESS_PATH.name}")
+    prefix_to_orcid_counter = {prefix: counter for prefix, counter in progress.items() if counter}
+    # downloads happen in threads, but extracting ORCIDs is CPU-bound so it's done in
+    # processes. forkserver avoids copying this process' memory into each worker.
+    process_executor = ProcessPoolExecutor(mp_context=multiprocessing.get_context("forkserver"))
+    with process_executor, ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                get_unannotated_orcids,
+                resource.prefix,
+                annotations.get(prefix_to_qid[resource.prefix], set()),
+                executor=process_executor,
+            ): resource.prefix
+            for resource in resources
+            if resource.prefix not in progress
+        }
+        it = tqdm(as_completed(futures), total=len(futures))
+        for future in it:
+            prefix = futures[future]
+            it.set_postfix(prefix=prefix)
+            try:
+                orcid_counter = future.result()
+            except ONTOLOGY_ERRORS as e:
+                secho(f"{prefix.upper()} failed with {type(e)}: {e}", fg="red")
+                continue
+            save_progress(prefix, orcid_counter)
+            if orcid_counter:
+                prefix_to_orcid_counter[prefix] = orcid_counter
+
+    # look up all unannotated ORCIDs at once instead of once per resource
+    orcids_unannotated = set().union(*prefix_to_orcid_counter.values())
+    secho(f"getting wikidata records for {len(orcids_unannotated)} ORCiDs")
+    orcid_to_records = defaultdict(list)
+    # these decide what gets posted and which ORCIDs are reported as missing from Wikidata, so
+    # they can't come from a stale cache, e.g., right after running push_wikidata.py
+    for record in get_orcid_records(orcids_unannotated, refresh=True):
+        orcid_to_records[record["orcid"]].append(record)
+
+    for prefix, orcid_counter in sorted(prefix_to_orcid_counter.items()):
+        local_missing, contributors = get_contributors(prefix, orcid_counter, orcid_to_records)
+        for orcid in local_missing:
+            wd_missing_orcids[orcid].append(prefix)
+        if contributors:
+            prefix_to_contributors[prefix] = contributors
+
+    with MISSING_WD_ORCIDS_PATH.open("w") as file:
+        for orcid, prefixes in sorted(wd_missing_orcids.items()):
+            file.write(f"{orcid}\t{'|'.join(sorted(prefixes))}\n")
+
+    lines = get_entity_lines(prefix_to_qid, prefix_to_contributors)
     if dry:
         secho("Running in dry mode. Quickstatements:", fg="cyan")
         for line in lines:
@@ -84,37 +178,109 @@ def main(dry: bool):
         res = client.post(lines, batch_name="Add additional ontology contributors")
         webbrowser.open_new_tab(res.batch_url)
 
+    # the run finished, so the next one starts over instead of resuming
+    PROGRESS_PATH.unlink(missing_ok=True)
 
-def get_existing_orcid_annotation_sparql(ontology_qid: str):
-    """Get a SPARQL query that looks for ORCID identifiers that are already annotated to an ontology."""
-    return f"SELECT DISTINCT ?orcid WHERE {{ wd:{ontology_qid} wdt:P767/wdt:P496 ?orcid }}"
 
+def load_progress() -> dict[str, Counter[str]]:
+    """Load the unannotated ORCIDs for ontologies scanned by a previous run."""
+    if not PROGRESS_PATH.is_file():
+        return {}
+    data = PROGRESS_PATH.read_bytes()
+    if not data.endswith(b"\n"):
+        # the previous run was killed mid-write, so drop the partial line before appending more
+        data = data[: data.rfind(b"\n") + 1]
+        PROGRESS_PATH.write_bytes(data)
+    rv = {}
+    for line in data.splitlines():
+        record = orjson.loads(line)
+        rv[record["prefix"]] = Counter(record["orcids"])
+    return rv
 
-def get_lines(prefix: str) -> tuple[set[str], list[EntityLine]]:
-    pp = bioregistry.get_preferred_prefix(prefix) or prefix
-    prefix_to_qid = get_prefix_to_qid()
-    ontology_qid = prefix_to_qid.get(prefix)
-    if ontology_qid is None:
-        secho(f"[{pp}] Could not get QID, skipping", fg="yellow")
-        return set(), []
 
-    url = f"http://purl.obolibrary.org/obo/{prefix}.json"
+def save_progress(prefix: str, orcid_counter: Counter[str]) -> None:
+    """Append the unannotated ORCIDs for an ontology to the progress file."""
+    with PROGRESS_PATH.open("ab") as file:
+        file.write(orjson.dumps({"prefix": prefix, "orcids": orcid_counter}) + b"\n")
+
+
+def get_resources(prefix_to_qid: dict[str, str]) -> list[bioregistry.Resource]:
+    """Get the OBO Foundry ontologies to check, skipping ones without a Wikidata QID up front."""
+    rv = []
+    for resource in bioregistry.resources():
+        if (
+            resource.prefix in SKIP
+            or not resource.get_obofoundry_prefix()
+            or resource.is_deprecated()
+        ):
+            continue
+        if resource.prefix not in prefix_to_qid:
+            secho(
+                f"[{get_preferred_prefix(resource.prefix)}] Could not get QID, skipping",
+                fg="yellow",
+            )
+            continue
+        rv.append(resource)
+    return rv
+
+
+EXISTING_ORCID_ANNOTATIONS_SPARQL_FMT = """\
+    SELECT DISTINCT ?ontology ?orcid
+    WHERE {
+        VALUES ?ontology { %s }
+        ?ontology wdt:P767/wdt:P496 ?orcid .
+    }
+""".rstrip()
+
+
+def get_all_existing_orcid_annotations(qids: Iterable[str]) -> dict[str, set[str]]:
+    """Get the ORCID identifiers that are already annotated to each of the given ontologies."""
+    values = " ".join(f"wd:{qid}" for qid in qids)
+    if not values:
+        return {}
+    sparql = EXISTING_ORCID_ANNOTATIONS_SPARQL_FMT % values
+    rv: defaultdict[str, set[str]] = defaultdict(set)
+    # these decide what gets posted to Wikidata, so they can't come from a stale cache
+    for record in get_wikidata_records(sparql, refresh=True):
+        rv[record["ontology"].removeprefix(WD_URI_PREFIX)].add(record["orcid"])
+    return dict(rv)
+
+
+def get_unannotated_orcids(
+    prefix: str, orcids_annotated: set[str], *, executor: Executor | None = None
+) -> Counter[str]:
+    """Count ORCIDs in the ontology that aren't yet annotated as its contributors in Wikidata."""
+    pp = get_preferred_prefix(prefix)
     uri_prefix = f"http://purl.obolibrary.org/obo/{prefix.upper()}_"
 
     secho(f"[{pp}] getting graph")
-    parse_results = bioontologies.get_obograph_by_prefix(prefix)
-    if parse_results.graph_document is None:
-        secho(f"[{pp}] No graphs, skipping", fg="yellow")
-        return set(), []
-    data = parse_results.graph_document.dict()
+    path = download_obograph(prefix)
+    if path is not None:
+        if executor is None:
+            orcid_counter = count_gzipped_obograph_orcids(path, uri_prefix=uri_prefix)
+        else:
+            orcid_counter = executor.submit(
+                count_gzipped_obograph_orcids, path, uri_prefix=uri_prefix
+            ).result()
+    else:
+        # there's no JSON release, so let bioontologies convert another artifact
+        parse_results = bioontologies.get_obograph_by_prefix(prefix)
+        if parse_results.graph_document is None:
+            secho(f"[{pp}] No graphs, skipping", fg="yellow")
+            return Counter()
+        nodes = (
+            node.model_dump()
+            for graph in parse_results.graph_document.graphs
+            for node in graph.nodes
+        )
+        orcid_counter = count_obograph_orcids(nodes, uri_prefix=uri_prefix)
 
-    orcid_counter = count_obograph_orcids(data, uri_prefix=uri_prefix)
     if not orcid_counter:
         secho(
             f"[{pp}] No structured contributor information, skipping",
             fg="yellow",
         )
-        return set(), []
+        return Counter()
 
     # secho(
     #     tabulate(
@@ -125,21 +291,90 @@ def get_lines(prefix: str) -> tuple[set[str], list[EntityLine]]:
     #     + "\n"
     # )
 
-    secho(f"[{pp}] getting existing ORCiD annotations")
-    orcids_annotated: set[str] = {
-        record["orcid"]
-        for record in get_wikidata_records(get_existing_orcid_annotation_sparql(ontology_qid))
-    }
-    orcids_unannotated = set(orcid_counter) - orcids_annotated
-    if not orcids_unannotated:
+    rv = Counter(
+        {orcid: count for orcid, count in orcid_counter.items() if orcid not in orcids_annotated}
+    )
+    if not rv:
         secho(
             f"[{pp}] All contributor information is already in Wikidata, skipping",
             fg="yellow",
         )
-        return orcids_unannotated, []
+    return rv
+
 
-    secho(f"[{pp}] getting wikidata records for {len(orcids_unannotated)} ORCiDs")
-    records = get_wikidata_records(format_custom_sparql(orcids_unannotated))
+def download_obograph(prefix: str) -> Path | None:
+    """Get the gzipped OBO Graph JSON release on disk, downloading it only if it changed."""
+    url = f"http://purl.obolibrary.org/obo/{prefix}.json"
+    path = OBOGRAPH_CACHE_DIRECTORY.joinpath(f"{prefix}.json.gz")
+    metadata_path = OBOGRAPH_CACHE_DIRECTORY.joinpath(f"{prefix}.metadata.json")
+
+    # revalidate the copy on disk, if there is one, so unchanged releases aren't downloaded again.
+    # no-store keeps requests-cache from reading the whole body into memory to save it, since
+    # the gzipped copy on disk already serves as the cache
+    headers = {"Cache-Control": "no-store"}
+    if path.is_file() and metadata_path.is_file():
+        metadata = orjson.loads(metadata_path.read_bytes())
+        if "ETag" in metadata:
+            headers["If-None-Match"] = metadata["ETag"]
+        if "Last-Modified" in metadata:
+            headers["If-Modified-Since"] = metadata["Last-Modified"]
+
+    with SESSION.get(url, headers=headers, stream=True, timeout=30) as res:
+        if res.status_code == 304:
+            return path
+        if res.ok:
+            OBOGRAPH_CACHE_DIRECTORY.mkdir(exist_ok=True)
+            metadata_path.unlink(missing_ok=True)
+            with gzip.open(path, "wb", compresslevel=1) as file:
+                for chunk in res.iter_content(chunk_size=1 << 20):
+                    file.write(chunk)
+            validators = {
+                key: res.headers[key] for key in ("ETag", "Last-Modified") if key in res.headers
+            }
+            if validators:
+                metadata_path.write_bytes(orjson.dumps(validators))
+            return path
+    return None
+
+
+def count_gzipped_obograph_orcids(path: Path, *, uri_prefix: str) -> Counter[str]:
+    """Count ORCIDs in a gzipped OBO Graph document, in a way that can run in a subprocess."""
+    return count_obograph_orcids(_iter_gzipped_obograph_nodes(path), uri_prefix=uri_prefix)
+
+
+def _get_decompressed_size(path: Path) -> int:
+    """Get the size of a gzipped file's contents from its trailer, which stores it modulo 4 GiB."""
+    with path.open("rb") as file:
+        file.seek(-4, os.SEEK_END)
+        size = int.from_bytes(file.read(4), "little")
+    # a JSON document compresses, so a size below the compressed one means the field wrapped
+    return size if size >= path.stat().st_size else 1 << 32
+
+
+def _iter_gzipped_obograph_nodes(path: Path) -> Iterable[dict[str, Any]]:
+    if _get_decompressed_size(path) < STREAMING_THRESHOLD:
+        graph_document = orjson.loads(gzip.decompress(path.read_bytes()))
+        for graph in graph_document["graphs"]:
+            yield from graph["nodes"]
+    else:
+        with gzip.open(path) as file:
+            yield from ijson.items(file, "graphs.item.nodes.item", use_float=True)
+
+
+def get_contributors(
+    prefix: str,
+    orcid_counter: Counter[str],
+    orcid_to_records: dict[str, list[WikidataRecord]],
+) -> tuple[set[str], list[str]]:
+    """Get the ORCIDs missing from Wikidata and the QIDs of the unannotated contributors."""
+    pp = get_preferred_prefix(prefix)
+
+    orcids_unannotated = set(orcid_counter)
+    records = [
+        dict(record)
+        for orcid in sorted(orcids_unannotated)
+        for record in orcid_to_records.get(orcid, [])
+    ]
     if not records:
         secho(
             f"[{pp}] All {len(orcids_unannotated)} unannotated contributors do not have associated Wikidata records",
@@ -150,29 +385,38 @@ def get_lines(prefix: str) -> tuple[set[str], list[EntityLine]]:
     for record in records:
         record["count"] = orcid_counter[record["orcid"]]
         record["contributor"] = record["contributor"].removeprefix(WD_URI_PREFIX)
-        record["contributorDescription"] = shorten(record["contributorDescription"], 60)
+        # the description is unbound for contributors who don't have one
+        if description := record.get("contributorDescription"):
+            record["contributorDescription"] = shorten(description, 60)
 
     wd_missing_orcid = orcids_unannotated - {record["orcid"] for record in records}
 
-    df = pd.DataFrame(records)
     secho(f"[{pp}] contributors not already captured by Wikidata:", fg="cyan")
-    secho(tabulate(df, headers=list(df.columns), showindex=False) + "\n")
-
-    qualifiers = [
-        TextQualifier(predicate="S854", target=url),
-        DateQualifier.retrieved("S"),
-    ]
-    lines = [
-        EntityLine(
-            subject=ontology_qid,
-            predicate="P767",  # contributor
-            target=record["contributor"],
-            qualifiers=qualifiers,
+    secho(tabulate(records, headers="keys", tablefmt="github") + "\n")
+
+    contributors = [record["contributor"] for record in records if "contributor" in record]
+    return wd_missing_orcid, contributors
+
+
+def get_entity_lines(
+    prefix_to_qid: dict[str, str], prefix_to_contributors: dict[str, list[str]]
+) -> list[EntityLine]:
+    """Get QuickStatements lines annotating each ontology with its contributors."""
+    retrieved = DateQualifier.retrieved("S")
+    lines = []
+    for prefix, contributors in prefix_to_contributors.items():
+        url = f"http://purl.obolibrary.org/obo/{prefix}.json"
+        qualifiers = [TextQualifier(predicate="S854", target=url), retrieved]
+        lines.extend(
+            EntityLine(
+                subject=prefix_to_qid[prefix],
+                predicate="P767",  # contributor
+                target=contributor,
+                qualifiers=qualifiers,
+            )
+            for contributor in contributors
         )
-        for record in records
-        if "contributor" in record
-    ]
-    return wd_missing_orcid, lines
+    return lines
 
 
 PREFIXES_SPARQL = """\
@@ -183,60 +427,51 @@ PREFIXES_SPARQL = """\
 """.rstrip()
 
 
+@functools.cache
 def get_prefix_to_qid() -> dict[str, str]:
     if PREFIXES_PATH.is_file():
-        return json.loads(PREFIXES_PATH.read_text())
+        return orjson.loads(PREFIXES_PATH.read_bytes())
     records = get_wikidata_records(PREFIXES_SPARQL)
     prefix_to_qid = {
         record["prefix"]: record["ontology"].removeprefix(WD_URI_PREFIX) for record in records
     }
-    PREFIXES_PATH.write_text(json.dumps(prefix_to_qid, indent=2, sort_keys=True))
+    PREFIXES_PATH.write_bytes(
+        orjson.dumps(prefix_to_qid, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS)
+    )
     return prefix_to_qid
 
 
-def count_obograph_orcids(graph_document, *, uri_prefix: str) -> Counter[str]:
-    rv: list[str] = []
-    for graph in graph_document["graphs"]:
-        for node in graph["nodes"]:
-            if not node["id"].startswith(uri_prefix):
-                continue
-            rv.extend(
-                orcid.upper() for orcid_raw in iter_orcids(node) if (orcid := orcid_raw.strip())
-            )
-    return Counter(rv)
-
-
-def iter_orcids(obj: Any) -> Iterable[str]:
-    if isinstance(obj, (list, set)):
-        for item in obj:
-            yield from iter_orcids(item)
-    elif isinstance(obj, dict):
-        for item in obj.values():
-            yield from iter_orcids(item)
-    elif isinstance(obj, str):
-        obj = obj.lower().replace(" ", "").replace(",", "").strip()
-        if '"' in obj:
-            # e.g., in OBI, some are written like 0000-0002-7245-3450"laurenm.wishnie"
-            obj = obj[: obj.find('"')]
-        if not obj:
-            pass
-        elif obj.startswith("https://orcid.org/orcid.org/"):
-            # see https://github.com/obophenotype/uberon/pull/2845
-            yield obj.removeprefix("https://orcid.org/orcid.org/").rstrip("/").strip()
-        elif obj.startswith("orcid:orcid.org/"):
-            yield obj.removeprefix("orcid:orcid.org/")
-        elif obj.startswith("orcid:"):
-            yield obj.removeprefix("orcid:").strip()
-        elif obj.startswith("http://orcid.org/"):
-            yield obj.removeprefix("http://orcid.org/").rstrip("/").strip()
-        elif obj.startswith("https://orcid.org/"):
-            yield obj.removeprefix("https://orcid.org/").rstrip("/").strip()
-        elif obj.startswith("orcid.org/"):
-            yield obj.removeprefix("orcid.org/").rstrip("/").strip()
-    elif obj is None or isinstance(obj, (bool, float, int)):
-        pass
-    else:
-        tqdm.write(f"unhandled type: {type(obj)}")
+#: Matches an ORCID identifier written as a URI or CURIE at the start of a JSON string,
+#: including common mistakes like ``https://orcid.org/orcid.org/`` (see
+#: https://github.com/obophenotype/uberon/pull/2845) and stray spaces, commas, or missing
+#: dashes like in ``orcid: 0000 0001 2345 6789``. A quote escaped with a backslash is inside
+#: a string rather than at its start, so it's skipped.
+ORCID_RE = re.compile(
+    rb'(?<!\\)"[ ,]*'
+    rb"(?:https?://orcid\.org/(?:orcid\.org/)?|orcid:[ ,]*(?:orcid\.org/)?|orcid\.org/)[ ,]*"
+    rb"(\d{4}(?:[ ,]*-?[ ,]*\d{4}){2}[ ,]*-?[ ,]*\d{3}[\dX])(?![\dX])",
+    re.IGNORECASE,
+)
+#: Characters that are dropped from a matched ORCID before it's reformatted
+ORCID_SEPARATORS = b" ,-"
+
+
+def _normalize_orcid(raw: bytes) -> str:
+    orcid = raw.translate(None, ORCID_SEPARATORS).decode().upper()
+    return f"{orcid[:4]}-{orcid[4:8]}-{orcid[8:12]}-{orcid[12:]}"
+
+
+def count_obograph_orcids(nodes: Iterable[dict[str, Any]], *, uri_prefix: str) -> Counter[str]:
+    # nodes imported from other ontologies are dropped as they're streamed
+    nodes = (node for node in nodes if node["id"].startswith(uri_prefix))
+    rv: Counter[str] = Counter()
+    # scanning serialized nodes is much faster than walking them in Python, and doing it in
+    # batches means a streamed document is never held in memory all at once
+    while batch := list(itertools.islice(nodes, SCAN_BATCH_SIZE)):
+        rv.update(
+            _normalize_orcid(match.group(1)) for match in ORCID_RE.finditer(orjson.dumps(batch))
+        )
+    return rv
 
 
 if __name__ == "__main__":